@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
+import asyncio
 import httpx
+import json
 import logging
 import os
-import yfinance as yf
+import time
 
 from dotenv import load_dotenv
+from pathlib import Path
+from typing import Optional, Tuple
 
 # Configure logging
 logging.basicConfig(
@@ -17,87 +21,263 @@ logger = logging.getLogger(__name__)
 # load environment variables
 load_dotenv()
 
+# Comma separated list of symbols to report on
+TICKERS = [t.strip().upper() for t in os.getenv("TICKERS", "RKLB").split(",") if t.strip()]
 
-def send_notification(title: str, message: str, emojis: list[str] = [], priority: str = "3") -> None:
+# How long a previously fetched quote may stand in for a failed fetch. The cron
+# runs once a weekday, so the default (4 days) covers the Saturday -> Tuesday gap.
+QUOTE_CACHE_TTL = int(os.getenv("QUOTE_CACHE_TTL", str(4 * 86400)))
+CACHE_DIR = Path(os.getenv("CACHE_DIR", "~/.cache")).expanduser()
+
+# loaded from .env
+NTFY_HOST = os.getenv("NTFY_HOST")
+NTFY_EOD_TOPIC = os.getenv("NTFY_EOD_TOPIC")
+NTFY_USERNAME = os.getenv("NTFY_USERNAME")
+NTFY_PASSWORD = os.getenv("NTFY_PASSWORD")
+
+# Shared ntfy client so repeated notifications reuse one keep-alive connection
+_NTFY_CLIENT = httpx.AsyncClient(
+    auth=httpx.BasicAuth(username=NTFY_USERNAME, password=NTFY_PASSWORD) if NTFY_USERNAME and NTFY_PASSWORD else None,
+    timeout=10,
+    http2=True,
+)
+
+# Yahoo gets its own client so the ntfy credentials are never sent there.
+# The chart endpoint works without the cookie/crumb dance the v7 quote API needs.
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+_YAHOO_CLIENT = httpx.AsyncClient(
+    timeout=10,
+    http2=True,
+    headers={"User-Agent": "Mozilla/5.0"},
+)
+
+
+async def send_notification(title: str, message: str, emojis: tuple[str, ...] = (), priority: str = "3",
+                            click: Optional[str] = None) -> None:
     """
     Send a notification using ntfy.sh.
     
     Args:
         title (str): The notification title
         message (str): The notification message
-        emojis (list[str]): List of emoji tags to include
+        emojis (tuple[str, ...]): Emoji tags to include
         priority (int): The notification priority (0-4)
+        click (str): Optional URL to open when the notification is tapped
     """
+    if not NTFY_HOST or not NTFY_EOD_TOPIC:
+        logger.error("NTFY_HOST and NTFY_EOD_TOPIC environment variables must be set.")
+        return
+
     try:
-        logger.info(f"Seeing NTFY auth {os.getenv('NTFY_USERNAME')}/{os.getenv('NTFY_PASSWORD')}")
-        auth = httpx.BasicAuth(username=os.getenv("NTFY_USERNAME"), 
-                               password=os.getenv("NTFY_PASSWORD"))
-        
-        client = httpx.Client(auth=auth, timeout=10)
-        logger.info(f"Sending notification to {os.getenv('NTFY_HOST')}/{os.getenv('NTFY_EOD_TOPIC')}")
-        response = client.post(
-            f"{os.getenv('NTFY_HOST')}/{os.getenv('NTFY_EOD_TOPIC')}",
+        logger.info(f"Sending notification to {NTFY_HOST}/{NTFY_EOD_TOPIC}")
+        headers = {
+            "Title": title,
+            "Priority": str(priority),
+            "Tags": ",".join(emojis),
+        }
+        if click:
+            headers["Click"] = click
+
+        response = await _NTFY_CLIENT.post(
+            f"{NTFY_HOST}/{NTFY_EOD_TOPIC}",
             data=message,
-            headers={
-                "Title": title,
-                "Priority": str(priority),
-                "Tags": ",".join(emojis) if emojis else "",
-                "Click": "https://finance.yahoo.com/quote/RKLB/"
-            }
+            headers=headers,
         )
         response.raise_for_status()
         logger.info(f"Notification sent successfully: {response.text}")
     except Exception as e:
         logger.error(f"Failed to send notification: {e}")
 
-def main() -> None:
+
+def quote_cache_path(ticker: str) -> Path:
+    """
+    Path of the last-good quote cache for a ticker.
+
+    Args:
+        ticker (str): The stock symbol
+    """
+    return CACHE_DIR / f"{ticker.lower()}.json"
+
+
+def read_quote_cache(ticker: str) -> Optional[dict]:
+    """
+    Read the last good quote regardless of its age.
+
+    Args:
+        ticker (str): The stock symbol
+
+    Returns:
+        Dict with price, change, ts and etag keys, or None if there is no cache
+    """
+    try:
+        return json.loads(quote_cache_path(ticker).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def load_cached_quote(ticker: str) -> Optional[dict]:
     """
-    Main function to fetch RKLB stock data and send notifications.
+    Load the last good quote if it is younger than QUOTE_CACHE_TTL.
+
+    Args:
+        ticker (str): The stock symbol
+
+    Returns:
+        Dict with price, change and ts keys, or None if missing or stale
     """
+    cached = read_quote_cache(ticker)
+    if cached is None or time.time() - cached.get("ts", 0) >= QUOTE_CACHE_TTL:
+        return None
+    return cached
+
+
+def save_cached_quote(ticker: str, price: float, change: float, etag: Optional[str] = None) -> None:
+    """
+    Save a successfully fetched quote for use when Yahoo has a hiccup.
+
+    Args:
+        ticker (str): The stock symbol
+        price (float): The current price
+        change (float): The percent change since the previous close
+        etag (str): ETag of the response the quote came from, if any
+    """
+    path = quote_cache_path(ticker)
     try:
-        # Fetch RKLB stock data
-        stock = yf.Ticker("RKLB")
-        current_price = stock.info.get('regularMarketPrice')
-        price_change = stock.info.get('regularMarketChangePercent')
-        
-        if current_price is None:
-            logger.error("Unable to fetch RKLB quote")
-            send_notification(
-                title="RKLB quote error",
-                message="Yahoo data error?",
-                priority="4",
-                emojis=['skull']
-            )
-            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"price": price, "change": change, "ts": time.time(), "etag": etag}))
+    except OSError as e:
+        logger.error(f"Failed to write quote cache: {e}")
+
+
+async def send_quote(ticker: str, price: float, change: float, note: str = "") -> None:
+    """
+    Format a quote and send it as a notification.
+
+    Args:
+        ticker (str): The stock symbol
+        price (float): The current price
+        change (float): The percent change since the previous close
+        note (str): Optional text appended to the message
+    """
+    # Format the price with 2 decimal places
+    formatted_price = f"${price:.2f}"
+    formatted_change = f"{change:.2f}%"
+
+    if change > 0:
+        emoji = "arrow_up"
+    elif change < 0:
+        emoji = "arrow_down"
+    else:
+        emoji = "arrow_up_down"
+
+    logger.info(f"{ticker} current price: {formatted_price} / {formatted_change}{note}")
+
+    await send_notification(
+        title=f"{ticker} quote",
+        message=f"{formatted_price} / {formatted_change}{note}",
+        emojis=(emoji,),
+        click=f"https://finance.yahoo.com/quote/{ticker}/"
+    )
+
+
+async def send_quote_error(ticker: str, message: str) -> None:
+    """
+    Fall back to a fresh cached quote, otherwise send an error notification.
+
+    Args:
+        ticker (str): The stock symbol
+        message (str): The error notification message
+    """
+    cached = load_cached_quote(ticker)
+    if cached is not None:
+        age = int((time.time() - cached["ts"]) // 60)
+        age_str = f"{age}m" if age < 60 else f"{age // 60}h"
+        await send_quote(ticker, cached["price"], cached["change"], note=f" (cached, {age_str} old)")
+        return
+
+    await send_notification(
+        title=f"{ticker} quote error",
+        message=message,
+        priority="4",
+        emojis=('skull',),
+        click=f"https://finance.yahoo.com/quote/{ticker}/"
+    )
+
+
+async def fetch_quote(ticker: str) -> Optional[Tuple[float, float]]:
+    """
+    Fetch the current price and percent change for a ticker from Yahoo.
+
+    The cached ETag is sent as If-None-Match so an unchanged quote comes
+    back as an empty 304 and the cached values are reused.
+
+    Args:
+        ticker (str): The stock symbol
+
+    Returns:
+        Tuple of (price, percent change), or None if Yahoo's data is incomplete
+
+    Raises:
+        httpx.HTTPError: If the request fails
+    """
+    cached = read_quote_cache(ticker)
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+
+    response = await _YAHOO_CLIENT.get(
+        YAHOO_CHART_URL.format(ticker=ticker),
+        params={"range": "1d", "interval": "1d"},
+        headers=headers,
+    )
+    if response.status_code == 304 and cached:
+        logger.info(f"{ticker} quote unchanged, using cached values")
+        save_cached_quote(ticker, cached["price"], cached["change"], cached["etag"])
+        return cached["price"], cached["change"]
+    response.raise_for_status()
+
+    meta = response.json()["chart"]["result"][0]["meta"]
+    current_price = meta.get("regularMarketPrice")
+    previous_close = meta.get("previousClose") or meta.get("chartPreviousClose")
+    if current_price is None or not previous_close:
+        return None
+
+    price_change = (current_price / previous_close - 1) * 100
+    save_cached_quote(ticker, current_price, price_change, response.headers.get("ETag"))
+    return current_price, price_change
 
-        # Format the price with 2 decimal places
-        formatted_price = f"${current_price:.2f}"
-        formatted_change = f"{price_change:.2f}%"
 
-        if price_change > 0:
-            emoji = "arrow_up"
-        elif price_change < 0:
-            emoji = "arrow_down"
-        else:
-            emoji = "arrow_up_down"
+async def report_quote(ticker: str) -> None:
+    """
+    Fetch a single ticker's quote and send a notification for it.
+
+    Args:
+        ticker (str): The stock symbol
+    """
+    try:
+        quote = await fetch_quote(ticker)
+
+        if quote is None:
+            logger.error(f"Unable to fetch {ticker} quote")
+            await send_quote_error(ticker, "Yahoo data error?")
+            return
 
-        logger.info(f"RKLB current price: {formatted_price} / {formatted_change}")
-        
         # Send notification with the current price
-        send_notification(
-            title="RKLB quote",
-            message=f"{formatted_price} / {formatted_change}",
-            emojis=[emoji]
-        )
+        await send_quote(ticker, *quote)
 
     except Exception as e:
-        logger.error(f"Error in main function: {e}")
-        send_notification(
-            title="RKLB quote error",
-            message="Yahoo down?",
-            priority=4,
-            emojis=['skull']
-        )
+        logger.error(f"Error fetching {ticker}: {e}")
+        await send_quote_error(ticker, "Yahoo down?")
+
+
+async def main() -> None:
+    """
+    Main function to fetch stock data for every ticker and send notifications.
+    """
+    try:
+        await asyncio.gather(*(report_quote(ticker) for ticker in TICKERS))
+    finally:
+        await asyncio.gather(_YAHOO_CLIENT.aclose(), _NTFY_CLIENT.aclose())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    asyncio.run(main())
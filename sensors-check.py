@@ -15,28 +15,27 @@ CREATE TABLE temp_humidity (
 	PRIMARY KEY (location, timestamp)
 );
 
-JSON output: 
-[{"mac":"24:58:7c:ac:61:8c","location":"wine","timestamp":"2025-06-29 23:46:18.000000"},
-{"mac":"24:58:7c:ac:61:8c","location":"wine","timestamp":"2025-06-30 00:01:55.000000"},
-{"mac":"24:58:7c:ac:61:8c","location":"wine","timestamp":"2025-06-30 00:17:32.000000"},
-{"mac":"24:58:7c:ac:61:8c","location":"wine","timestamp":"2025-06-30 00:33:09.000000"},
-{"mac":"24:58:7c:ac:61:8c","location":"wine","timestamp":"2025-06-30 00:48:46.000000"},
-{"mac":"24:58:7c:ac:61:8c","location":"wine","timestamp":"2025-06-30 01:04:23.000000"},
-{"mac":"24:58:7c:ac:61:8c","location":"wine","timestamp":"2025-06-30 01:20:00.000000"},
-{"mac":"24:58:7c:ac:61:8c","location":"wine","timestamp":"2025-06-30 01:35:37.000000"}]
+The primary key leads with location, so the cutoff scan wants its own index on
+timestamp. Create it once on the server:
+CREATE INDEX IF NOT EXISTS ix_temp_humidity_timestamp ON temp_humidity (timestamp);
+
+Tab-separated output (one row per sensor, aggregated by SQLite):
+24:58:7c:ac:61:8c	wine	3
+24:58:7c:ac:61:8d	garage	1
 
 
 """
 
 import asyncio
-import json
 import sys
 import logging
 import os
+import sqlite3
 import httpx
-from collections import defaultdict
+from contextlib import closing
 from datetime import datetime, timedelta, timezone
-from typing import List, Tuple, Dict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 import asyncssh
 from dotenv import load_dotenv
 
@@ -53,6 +52,9 @@ load_dotenv()
 # Configuration constants
 MINUTES_AGO = int(os.getenv("MINUTES_AGO", "45"))
 MIN_CHECKINS = int(os.getenv("MIN_CHECKINS", "2"))
+ROSTER_TTL_DAYS = int(os.getenv("ROSTER_TTL_DAYS", "7"))
+CACHE_DIR = Path(os.getenv("CACHE_DIR", "~/.cache")).expanduser()
+ROSTER_PATH = CACHE_DIR / "sensors.db"
 
 # loaded from .env
 NTFY_HOST = os.getenv("NTFY_HOST")
@@ -63,14 +65,35 @@ SSH_HOST = os.getenv("SSH_HOST")
 SSH_USERNAME = os.getenv("SSH_USERNAME")
 DATABASE_PATH = os.getenv("DATABASE_PATH")
 
-def send_notification(title: str, message: str, emojis: list[str] = [], priority: str = "3") -> None:
+# Aggregate on the remote side so only one row per sensor crosses SSH.
+# No HAVING filter: an empty result must still mean "no data at all".
+# The planner uses ix_temp_humidity_timestamp (see module docstring) when it
+# exists; no INDEXED BY hint, which would error if it were missing.
+_QUERY_TEMPLATE = """
+SELECT mac, MIN(location) AS location, COUNT(*) AS checkins
+FROM temp_humidity
+WHERE timestamp >= '{cutoff}'
+GROUP BY mac
+ORDER BY mac
+"""
+
+# Credentials are fixed for the life of the process, so encode them once
+_AUTH = httpx.BasicAuth(username=NTFY_USERNAME, password=NTFY_PASSWORD) if NTFY_USERNAME and NTFY_PASSWORD else None
+
+# Shared ntfy client so repeated notifications reuse one keep-alive connection
+_NTFY_CLIENT = httpx.AsyncClient(auth=_AUTH, timeout=10)
+
+# Shared SSH connection so every query in a run reuses one key exchange and auth
+_SSH_CONN: Optional[asyncssh.SSHClientConnection] = None
+
+async def send_notification(title: str, message: str, emojis: tuple[str, ...] = (), priority: str = "3") -> None:
     """
     Send a notification using ntfy.sh.
     
     Args:
         title (str): The notification title
         message (str): The notification message
-        emojis (list[str]): List of emoji tags to include
+        emojis (tuple[str, ...]): Emoji tags to include
         priority (str): The notification priority (0-4)
     """
     if not NTFY_HOST or not NTFY_SENSOR_TOPIC:
@@ -78,28 +101,50 @@ def send_notification(title: str, message: str, emojis: list[str] = [], priority
         return
 
     try:
-        auth = httpx.BasicAuth(username=NTFY_USERNAME, password=NTFY_PASSWORD) if NTFY_USERNAME and NTFY_PASSWORD else None
-        
-        headers = {
-            "Title": title,
-            "Priority": str(priority),
-        }
+        headers = {"Title": title, "Priority": str(priority)}
         if emojis:
             headers["Tags"] = ",".join(emojis)
 
-        with httpx.Client(auth=auth, timeout=10) as client:
-            logger.info(f"Sending notification to {NTFY_HOST}/{NTFY_SENSOR_TOPIC}")
-            response = client.post(
-                f"{NTFY_HOST}/{NTFY_SENSOR_TOPIC}",
-                data=message,
-                headers=headers,
-            )
-            response.raise_for_status()
-            logger.info(f"Notification sent successfully: {response.text}")
+        logger.info("Sending notification to %s/%s", NTFY_HOST, NTFY_SENSOR_TOPIC)
+        response = await _NTFY_CLIENT.post(
+            f"{NTFY_HOST}/{NTFY_SENSOR_TOPIC}",
+            data=message,
+            headers=headers,
+        )
+        response.raise_for_status()
+        logger.info("Notification sent successfully: %s", response.text)
     except httpx.HTTPStatusError as e:
-        logger.error(f"HTTP error sending notification: {e.response.status_code} - {e.response.text}")
+        logger.error("HTTP error sending notification: %s - %s", e.response.status_code, e.response.text)
     except Exception as e:
-        logger.error(f"Failed to send notification: {e}")
+        logger.error("Failed to send notification: %s", e)
+
+
+async def get_ssh_connection(host: str, username: str) -> asyncssh.SSHClientConnection:
+    """
+    Return the shared SSH connection, opening it on first use.
+
+    Args:
+        host: The SSH host address
+        username: The SSH username
+
+    Returns:
+        The cached SSH client connection
+    """
+    global _SSH_CONN
+    if _SSH_CONN is None:
+        _SSH_CONN = await asyncssh.connect(host, username=username)
+    return _SSH_CONN
+
+
+async def close_ssh_connection() -> None:
+    """
+    Close the shared SSH connection if one is open.
+    """
+    global _SSH_CONN
+    if _SSH_CONN is not None:
+        conn, _SSH_CONN = _SSH_CONN, None
+        conn.close()
+        await conn.wait_closed()
 
 
 async def execute_sql_query(host: str, username: str, sql: str) -> str:
@@ -112,19 +157,19 @@ async def execute_sql_query(host: str, username: str, sql: str) -> str:
         sql: The SQL query to execute
         
     Returns:
-        The JSON output from the SQLite query
+        The tab-separated output from the SQLite query
         
     Raises:
         asyncssh.Error: If SSH connection or command execution fails
     """
-    logger.debug(f"Executing query: {sql}")
+    logger.debug("Executing query: %s", sql)
     try:
-        async with asyncssh.connect(host, username=username) as conn:
-            command = f'sqlite3 -json {DATABASE_PATH} "{sql}"'
-            result = await conn.run(command)
-            return result.stdout
+        conn = await get_ssh_connection(host, username)
+        # Feed the SQL on stdin so it never passes through remote shell quoting
+        result = await conn.run(f"sqlite3 {DATABASE_PATH}", input=f".mode tabs\n{sql}")
+        return result.stdout
     except asyncssh.Error as e:
-        logger.error(f"SSH connection error: {e}")
+        logger.error("SSH connection error: %s", e)
         raise
 
 
@@ -137,53 +182,116 @@ def build_query() -> str:
     """
     # Calculate timestamp for MINUTES_AGO minutes ago in UTC
     cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=MINUTES_AGO)
-    cutoff_str = cutoff_time.strftime('%Y-%m-%d %H:%M:%S')
-    
-    return f"""
-    SELECT mac, location, timestamp 
-    FROM temp_humidity 
-    WHERE timestamp >= '{cutoff_str}'
-    ORDER BY mac, timestamp
+    # Naive so isoformat() matches the stored 'YYYY-MM-DD HH:MM:SS' form without a UTC offset
+    cutoff_str = cutoff_time.replace(tzinfo=None).isoformat(sep=' ', timespec='seconds')
+
+    return _QUERY_TEMPLATE.format(cutoff=cutoff_str)
+
+
+def parse_sensor_data(output: str) -> Dict[str, Tuple[str, int]]:
     """
+    Parse the per-sensor aggregate query output.
 
+    Args:
+        output: Tab-separated rows (mac, location, checkins) from the per-sensor aggregate query.
 
-def analyze_sensor_data(json_output: str) -> List[Tuple[str, str]]:
+    Returns:
+        Dict mapping mac to (location, checkins).
+    """
+    sensors: Dict[str, Tuple[str, int]] = {}
+    for line in output.splitlines():
+        try:
+            mac, location, checkins = line.split('\t', 2)
+            count = int(checkins)
+        except ValueError:
+            logger.warning("Skipping malformed row from database: %r", line)
+            continue
+        if not mac:
+            continue
+        sensors[mac] = (location or 'unknown location', count)
+
+    return sensors
+
+
+def analyze_sensor_data(sensors: Dict[str, Tuple[str, int]], known_sensors: Dict[str, str]) -> List[Tuple[str, str]]:
     """
     Analyze sensor data to find sensors with fewer than MIN_CHECKINS.
 
+    Known sensors with no rows at all in the window count as missing too.
+
     Args:
-        json_output: JSON string from SQLite query.
+        sensors: Dict mapping mac to (location, checkins) for the current window.
+        known_sensors: Dict mapping mac to location for recently seen sensors.
 
     Returns:
         List of tuples (mac, location) for sensors with missing check-ins.
     """
-    if not json_output.strip():
-        return []
+    silent = [(mac, location) for mac, location in known_sensors.items() if mac not in sensors]
+
+    if logger.isEnabledFor(logging.INFO):
+        for mac, (location, count) in sensors.items():
+            logger.info("MAC: %s, Location: %s, Entries: %d", mac, location, count)
+        for mac, location in silent:
+            logger.info("MAC: %s, Location: %s, Entries: 0", mac, location)
+
+    return [(mac, location) for mac, (location, count) in sensors.items() if count < MIN_CHECKINS] + silent
+
+
+def _open_roster() -> sqlite3.Connection:
+    """
+    Open the local known-sensor roster, creating it if needed.
+
+    Returns:
+        SQLite connection to the roster database
+    """
+    ROSTER_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(ROSTER_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS known ("
+        "mac TEXT PRIMARY KEY, location TEXT NOT NULL, last_seen INTEGER NOT NULL)"
+    )
+    return conn
+
+
+def load_known_sensors() -> Dict[str, str]:
+    """
+    Load sensors seen within the last ROSTER_TTL_DAYS days from the local roster.
 
+    Returns:
+        Dict mapping mac to location. Empty if the roster can't be read.
+    """
     try:
-        records = json.loads(json_output)
-    except json.JSONDecodeError:
-        logger.exception("Error parsing JSON output from database.")
-        return []
+        with closing(_open_roster()) as conn:
+            rows = conn.execute(
+                "SELECT mac, location FROM known WHERE last_seen >= strftime('%s', 'now') - ?",
+                (ROSTER_TTL_DAYS * 86400,),
+            ).fetchall()
+    except (OSError, sqlite3.Error):
+        logger.exception("Error reading sensor roster %s.", ROSTER_PATH)
+        return {}
 
-    mac_counts = defaultdict(int)
-    mac_locations: Dict[str, str] = {}
+    return dict(rows)
 
-    for record in records:
-        mac = record.get('mac')
-        if not mac:
-            continue
-        mac_counts[mac] += 1
-        if mac not in mac_locations:
-            mac_locations[mac] = record.get('location', 'unknown location')
-
-    missing_checkins = []
-    for mac, count in mac_counts.items():
-        logger.info(f"MAC: {mac}, Location: {mac_locations.get(mac)}, Entries: {count}")
-        if count < MIN_CHECKINS:
-            missing_checkins.append((mac, mac_locations[mac]))
-    
-    return missing_checkins
+
+def update_known_sensors(sensors: Dict[str, Tuple[str, int]]) -> None:
+    """
+    Record the sensors seen this run and drop ones not seen for ROSTER_TTL_DAYS days.
+
+    Args:
+        sensors: Dict mapping mac to (location, checkins) for the current window.
+    """
+    try:
+        with closing(_open_roster()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO known (mac, location, last_seen) VALUES (?, ?, strftime('%s', 'now'))",
+                [(mac, location) for mac, (location, _) in sensors.items()],
+            )
+            conn.execute(
+                "DELETE FROM known WHERE last_seen < strftime('%s', 'now') - ?",
+                (ROSTER_TTL_DAYS * 86400,),
+            )
+    except (OSError, sqlite3.Error):
+        logger.exception("Error updating sensor roster %s.", ROSTER_PATH)
 
 
 async def main():
@@ -201,50 +309,68 @@ async def main():
     missing_vars = [name for name, value in required_vars.items() if not value]
 
     if missing_vars:
-        logger.error(f"Missing required environment variables: {', '.join(missing_vars)}. Exiting.")
+        logger.error("Missing required environment variables: %s. Exiting.", ', '.join(missing_vars))
         sys.exit(1)
 
     try:
         # Build and execute query
         sql_query = build_query()
-        logger.info(f"Querying for data since: {datetime.now(timezone.utc) - timedelta(minutes=MINUTES_AGO)}")
+        logger.info("Querying for data since: %s", datetime.now(timezone.utc) - timedelta(minutes=MINUTES_AGO))
         
-        json_output = await execute_sql_query(SSH_HOST, SSH_USERNAME, sql_query)
-        logger.debug(f"JSON output: {json_output}")
+        output = await execute_sql_query(SSH_HOST, SSH_USERNAME, sql_query)
+        logger.debug("Query output: %s", output)
 
-        if not json_output.strip():
+        if not output.strip():
             logger.warning("No sensor data found in time period. All sensors may be offline.")
-            send_notification(
-                title="Sensor Check-in Alert",
-                message=f"No sensor data received in the last {MINUTES_AGO} minutes. All sensors may be offline.",
-                priority="4",
-                emojis=['warning', 'thermometer']
+            await asyncio.gather(
+                send_notification(
+                    title="Sensor Check-in Alert",
+                    message=f"No sensor data received in the last {MINUTES_AGO} minutes. All sensors may be offline.",
+                    priority="4",
+                    emojis=('warning', 'thermometer')
+                ),
+                close_ssh_connection(),
             )
             return
 
-        missing_checkins = analyze_sensor_data(json_output)
+        sensors = parse_sensor_data(output)
+        missing_checkins = analyze_sensor_data(sensors, load_known_sensors())
+        update_known_sensors(sensors)
         
         if missing_checkins:
-            logger.warning(f"Missing check-ins detected for {len(missing_checkins)} sensor(s).")
+            logger.warning("Missing check-ins detected for %d sensor(s).", len(missing_checkins))
             
             missing_sensors_str = "\n".join(
                 [f"{mac} ({location})" for mac, location in missing_checkins]
             )
             message = f"Missing check-ins detected for {len(missing_checkins)} sensor(s):\n{missing_sensors_str}"
             
-            send_notification(
-                title="Sensor Check-in Alert",
-                message=message,
-                priority="2",
-                emojis=['warning', 'thermometer']
+            # SSH isn't needed any more, so tear it down while the alert is in flight
+            await asyncio.gather(
+                send_notification(
+                    title="Sensor Check-in Alert",
+                    message=message,
+                    priority="2",
+                    emojis=('warning', 'thermometer')
+                ),
+                close_ssh_connection(),
             )
         else:
-            logger.info(f"All sensors have sufficient check-ins in the last {MINUTES_AGO} minutes.")
+            logger.info("All sensors have sufficient check-ins in the last %d minutes.", MINUTES_AGO)
             
     except Exception:
         logger.exception("An unhandled error occurred during script execution.")
         sys.exit(1)
+    finally:
+        await close_ssh_connection()
+        await _NTFY_CLIENT.aclose()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop isn't available everywhere (e.g. Windows); fall back to the default loop
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())